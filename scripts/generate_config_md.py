@@ -2,13 +2,17 @@
 """Utility functions for Configuration specification generation."""
 
 import argparse
+import functools
 import json
 import os
 import re
 import sys
 import textwrap
+from collections import deque
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Union
+from types import UnionType
+from typing import Any, Callable, Iterator, Optional, Union, get_args, get_origin
 
 from loguru import logger
 from pydantic.fields import ComputedFieldInfo, FieldInfo
@@ -18,47 +22,129 @@ from akkudoktoreos.config.config import ConfigEOS, GeneralSettings, get_config
 from akkudoktoreos.core.pydantic import PydanticBaseModel
 from akkudoktoreos.utils.docs import get_model_structure_from_examples
 
-documented_types: set[PydanticBaseModel] = set()
-undocumented_types: dict[PydanticBaseModel, tuple[str, list[str]]] = dict()
 
-global_config_dict: dict[str, Any] = dict()
+@dataclass
+class GenCtx:
+    """State of one configuration specification generation run."""
+
+    # Model types already documented or queued for documentation
+    documented: set[PydanticBaseModel] = field(default_factory=set)
+    # Worklist of nested model types still to be documented
+    pending: deque[tuple[PydanticBaseModel, tuple[str, list[str]]]] = field(
+        default_factory=deque
+    )
+    # Full example config assembled from the top level examples
+    config_dict: dict[str, Any] = field(default_factory=dict)
+
+
+# Local log file path that shall not leak to the documentation
+EOS_LOG_PATH_RE = re.compile(r'(?<=["\'])/[^"\']*/output/eos\.log(?=["\'])')
 
 
+@functools.lru_cache(maxsize=None)
 def get_title(config: PydanticBaseModel) -> str:
     if config.__doc__ is None:
         raise NameError(f"Missing docstring: {config}")
     return config.__doc__.strip().splitlines()[0].strip(".")
 
 
+@functools.lru_cache(maxsize=None)
 def get_body(config: PydanticBaseModel) -> str:
     if config.__doc__ is None:
         raise NameError(f"Missing docstring: {config}")
     return textwrap.dedent("\n".join(config.__doc__.strip().splitlines()[1:])).strip()
 
 
-def resolve_nested_types(field_type: Any, parent_types: list[str]) -> list[tuple[Any, list[str]]]:
-    resolved_types: list[tuple[type, list[str]]] = []
+@functools.lru_cache(maxsize=None)
+def resolve_nested_types(
+    field_type: Any, parent_types: tuple[str, ...]
+) -> tuple[tuple[Any, tuple[str, ...]], ...]:
+    """Resolve Union/list generics into their leaf types.
 
-    origin = getattr(field_type, "__origin__", field_type)
-    if origin is Union:
-        for arg in getattr(field_type, "__args__", []):
+    Pure function of its (hashable) inputs, so results are memoized and shared.
+    """
+    resolved_types: list[tuple[Any, tuple[str, ...]]] = []
+
+    origin = get_origin(field_type) or field_type
+    if origin is Union or origin is UnionType:
+        for arg in get_args(field_type):
             resolved_types.extend(resolve_nested_types(arg, parent_types))
     elif origin is list:
-        for arg in getattr(field_type, "__args__", []):
-            resolved_types.extend(resolve_nested_types(arg, parent_types + ["list"]))
+        for arg in get_args(field_type):
+            resolved_types.extend(resolve_nested_types(arg, parent_types + ("list",)))
     else:
         resolved_types.append((field_type, parent_types))
 
-    return resolved_types
+    return tuple(resolved_types)
+
+
+@functools.lru_cache(maxsize=None)
+def _is_base_model(field_type: Any) -> bool:
+    """Check whether a resolved field type is a pydantic model class."""
+    return isinstance(field_type, type) and issubclass(field_type, PydanticBaseModel)
+
+
+@functools.lru_cache(maxsize=None)
+def _all_fields(
+    model_class: PydanticBaseModel,
+) -> tuple[tuple[str, Union[FieldInfo, ComputedFieldInfo]], ...]:
+    """Get the regular and computed fields of a model class."""
+    return tuple(model_class.model_fields.items()) + tuple(
+        model_class.model_computed_fields.items()
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _examples_for(model_class: PydanticBaseModel, multiple: bool) -> tuple[PydanticBaseModel, ...]:
+    """Validate the example instances of a model class once and share them afterwards.
+
+    Uses the core validator the model class already holds instead of going through `__init__`.
+    """
+    return tuple(
+        model_class.model_validate(data)
+        for data in get_model_structure_from_examples(model_class, multiple)
+    )
 
 
 def create_model_from_examples(
     model_class: PydanticBaseModel, multiple: bool
 ) -> list[PydanticBaseModel]:
     """Create a model instance with default or example values, respecting constraints."""
-    return [
-        model_class(**data) for data in get_model_structure_from_examples(model_class, multiple)
-    ]
+    return list(_examples_for(model_class, multiple))
+
+
+@functools.lru_cache(maxsize=None)
+def _example_dicts_for(
+    model_class: PydanticBaseModel, multiple: bool
+) -> tuple[tuple[dict[str, Any], ...], tuple[dict[str, Any], ...]]:
+    """Dump the example instances of a model class without and with computed fields.
+
+    The returned dicts are shared between calls and must not be modified.
+    """
+    ins_dict_list = []
+    ins_out_dict_list = []
+    for ins in create_model_from_examples(model_class, multiple):
+        # Dump to dict to use custom serializers and then merge with parent keys
+        ins_dict_list.append(ins.model_dump(include_computed_fields=False))
+
+        if not type(ins).model_computed_fields:
+            # Nothing to add - output is the same as input
+            ins_out_dict_list.append(ins_dict_list[-1])
+            continue
+        ins_out_dict_list.append(ins.model_dump(include_computed_fields=True))
+    return tuple(ins_dict_list), tuple(ins_out_dict_list)
+
+
+def json_code_block(data: Any) -> str:
+    """Format data as indented JSON for an rst code block.
+
+    Values without a JSON representation (e.g. paths) are converted by `str`, the same
+    way `PydanticBaseModel.model_dump_json` does.
+
+    Stays on stdlib json: orjson only supports 2-space indentation and does not escape
+    non-ASCII characters, which would change the generated documentation.
+    """
+    return textwrap.indent(json.dumps(data, indent=4, default=str), "   ")
 
 
 def build_nested_structure(keys: list[str], value: Any) -> Any:
@@ -84,6 +170,7 @@ def get_default_value(field_info: Union[FieldInfo, ComputedFieldInfo], regular_f
     return default_value
 
 
+@functools.lru_cache(maxsize=None)
 def get_type_name(field_type: type) -> str:
     type_name = str(field_type).replace("typing.", "").replace("pathlib._local", "pathlib")
     if type_name.startswith("<class"):
@@ -97,17 +184,24 @@ def generate_config_table_md(
     prefix: str,
     toplevel: bool = False,
     extra_config: bool = False,
+    ctx: Optional[GenCtx] = None,
 ) -> str:
     """Generate a markdown table for given configurations.
 
+    Nested model types found in the fields are queued to the context and documented as extra
+    tables by the calling top level (non extra) configuration.
+
     Args:
         config (PydanticBaseModel): PydanticBaseModel configuration definition.
         prefix (str): Prefix for table entries.
+        ctx (Optional[GenCtx]): Generation state. A fresh one is used if not given.
 
     Returns:
         str: The markdown table as a string.
     """
-    table = ""
+    if ctx is None:
+        ctx = GenCtx()
+    parts: list[str] = []
     if toplevel:
         title = get_title(config)
 
@@ -120,23 +214,28 @@ def generate_config_table_md(
             env_header_underline = "| -------------------- "
             env_width = "20 "
 
-        table += f"{heading_level} {title}\n\n"
+        parts.append(f"{heading_level} {title}\n\n")
 
         body = get_body(config)
         if body:
-            table += body
-            table += "\n\n"
+            parts.append(body)
+            parts.append("\n\n")
 
-        table += (
+        if not _all_fields(config):
+            # Nothing to tabulate - skip example instantiation and dumps
+            parts.append("No configurable fields.\n\n")
+            if not extra_config:
+                ctx.config_dict[toplevel_keys[0]] = [{}] if toplevel_keys[-1] == "list" else {}
+            return "".join(parts)
+
+        parts.append(
             ":::{table} "
             + f"{'::'.join(toplevel_keys)}\n:widths: 10 {env_width}10 5 5 30\n:align: left\n\n"
         )
-        table += f"| Name {env_header}| Type | Read-Only | Default | Description |\n"
-        table += f"| ---- {env_header_underline}| ---- | --------- | ------- | ----------- |\n"
+        parts.append(f"| Name {env_header}| Type | Read-Only | Default | Description |\n")
+        parts.append(f"| ---- {env_header_underline}| ---- | --------- | ------- | ----------- |\n")
 
-    for field_name, field_info in list(config.model_fields.items()) + list(
-        config.model_computed_fields.items()
-    ):
+    for field_name, field_info in _all_fields(config):
         regular_field = isinstance(field_info, FieldInfo)
 
         config_name = field_name if extra_config else field_name.upper()
@@ -158,101 +257,107 @@ def generate_config_table_md(
                 description = "Deprecated!"
             else:
                 description = deprecated
-        table += f"| {field_name} {env_entry}| `{type_name}` | `{read_only}` | `{default_value}` | {description} |\n"
+        parts.append(
+            f"| {field_name} {env_entry}| `{type_name}` | `{read_only}` | `{default_value}` | {description} |\n"
+        )
 
         inner_types: dict[PydanticBaseModel, tuple[str, list[str]]] = dict()
 
         def extract_nested_models(subtype: Any, subprefix: str, parent_types: list[str]):
             if subtype in inner_types.keys():
                 return
-            nested_types = resolve_nested_types(subtype, [])
-            for nested_type, nested_parent_types in nested_types:
-                if issubclass(nested_type, PydanticBaseModel):
-                    new_parent_types = parent_types + nested_parent_types
+            for nested_type, nested_parent_types in resolve_nested_types(subtype, ()):
+                if _is_base_model(nested_type):
+                    new_parent_types = parent_types + list(nested_parent_types)
                     if "list" in parent_types:
                         new_prefix = ""
                     else:
                         new_prefix = f"{subprefix}"
                     inner_types.setdefault(nested_type, (new_prefix, new_parent_types))
-                    for nested_field_name, nested_field_info in list(
-                        nested_type.model_fields.items()
-                    ) + list(nested_type.model_computed_fields.items()):
+                    for nested_field_name, nested_field_info in _all_fields(nested_type):
                         nested_field_type = nested_field_info.annotation
-                        if new_prefix:
-                            new_prefix += f"{nested_field_name.upper()}__"
+                        child_prefix = (
+                            f"{new_prefix}{nested_field_name.upper()}__" if new_prefix else ""
+                        )
                         extract_nested_models(
                             nested_field_type,
-                            new_prefix,
+                            child_prefix,
                             new_parent_types + [nested_field_name],
                         )
 
         extract_nested_models(field_type, f"{prefix}{config_name}__", toplevel_keys + [field_name])
 
         for new_type, info in inner_types.items():
-            if new_type not in documented_types:
-                undocumented_types.setdefault(new_type, (info[0], info[1]))
+            if new_type not in ctx.documented:
+                # Mark on queueing so each type is documented exactly once
+                ctx.documented.add(new_type)
+                ctx.pending.append((new_type, (info[0], info[1])))
 
     if toplevel:
-        table += ":::\n\n"  # Add an empty line after the table
+        parts.append(":::\n\n")  # Add an empty line after the table
 
         has_examples_list = toplevel_keys[-1] == "list"
-        instance_list = create_model_from_examples(config, has_examples_list)
-        if instance_list:
-            ins_dict_list = []
-            ins_out_dict_list = []
-            for ins in instance_list:
-                # Transform to JSON (and manually to dict) to use custom serializers and then merge with parent keys
-                ins_json = ins.model_dump_json(include_computed_fields=False)
-                ins_dict_list.append(json.loads(ins_json))
-
-                ins_out_json = ins.model_dump_json(include_computed_fields=True)
-                ins_out_dict_list.append(json.loads(ins_out_json))
+        ins_dicts, ins_out_dicts = _example_dicts_for(config, has_examples_list)
+        if ins_dicts:
+            ins_dict_list = list(ins_dicts)
+            ins_out_dict_list = list(ins_out_dicts)
 
             same_output = ins_out_dict_list == ins_dict_list
             same_output_str = "/Output" if same_output else ""
 
-            table += f"#{heading_level} Example Input{same_output_str}\n\n"
-            table += "```{eval-rst}\n"
-            table += ".. code-block:: json\n\n"
+            parts.append(f"#{heading_level} Example Input{same_output_str}\n\n")
+            parts.append("```{eval-rst}\n")
+            parts.append(".. code-block:: json\n\n")
             if has_examples_list:
                 input_dict = build_nested_structure(toplevel_keys[:-1], ins_dict_list)
                 if not extra_config:
-                    global_config_dict[toplevel_keys[0]] = ins_dict_list
+                    ctx.config_dict[toplevel_keys[0]] = ins_dict_list
             else:
                 input_dict = build_nested_structure(toplevel_keys, ins_dict_list[0])
                 if not extra_config:
-                    global_config_dict[toplevel_keys[0]] = ins_dict_list[0]
-            table += textwrap.indent(json.dumps(input_dict, indent=4), "   ")
-            table += "\n"
-            table += "```\n\n"
+                    ctx.config_dict[toplevel_keys[0]] = ins_dict_list[0]
+            parts.append(json_code_block(input_dict))
+            parts.append("\n")
+            parts.append("```\n\n")
 
             if not same_output:
-                table += f"#{heading_level} Example Output\n\n"
-                table += "```{eval-rst}\n"
-                table += ".. code-block:: json\n\n"
+                parts.append(f"#{heading_level} Example Output\n\n")
+                parts.append("```{eval-rst}\n")
+                parts.append(".. code-block:: json\n\n")
                 if has_examples_list:
                     output_dict = build_nested_structure(toplevel_keys[:-1], ins_out_dict_list)
                 else:
                     output_dict = build_nested_structure(toplevel_keys, ins_out_dict_list[0])
-                table += textwrap.indent(json.dumps(output_dict, indent=4), "   ")
-                table += "\n"
-                table += "```\n\n"
-
-        while undocumented_types:
-            extra_config_type, extra_info = undocumented_types.popitem()
-            documented_types.add(extra_config_type)
-            table += generate_config_table_md(
-                extra_config_type, extra_info[1], extra_info[0], True, True
+                parts.append(json_code_block(output_dict))
+                parts.append("\n")
+                parts.append("```\n\n")
+
+        # Latest found first, to keep nested types close to where they are used
+        while not extra_config and ctx.pending:
+            extra_config_type, extra_info = ctx.pending.pop()
+            parts.append(
+                generate_config_table_md(
+                    extra_config_type, extra_info[1], extra_info[0], True, True, ctx
+                )
             )
 
-    return table
+    return "".join(parts)
 
 
-def generate_config_md(config_eos: ConfigEOS) -> str:
-    """Generate configuration specification in Markdown with extra tables for prefixed values.
+def generate_config_md_fragments(
+    config_eos: ConfigEOS, ctx: Optional[GenCtx] = None
+) -> Iterator[str]:
+    """Generate configuration specification in Markdown fragment by fragment.
 
-    Returns:
-        str: The Markdown representation of the configuration spec.
+    Fragments are complete sections (a top level config table including its extra tables, the
+    full example config), so the log path scrubbing is applied per fragment.
+
+    Args:
+        config_eos (ConfigEOS): The EOS configuration.
+        ctx (Optional[GenCtx]): Generation state. A fresh one is used if not given.
+
+    Yields:
+        str: The next fragment of the Markdown representation of the configuration spec.
     """
     # Fix file path for general settings to not show local/test file path
     GeneralSettings._config_file_path = Path(
@@ -260,37 +365,46 @@ def generate_config_md(config_eos: ConfigEOS) -> str:
     )
     GeneralSettings._config_folder_path = config_eos.general.config_file_path.parent
 
-    markdown = "# Configuration Table\n\n"
+    def scrub(fragment: str) -> str:
+        # Assure log path does not leak to documentation
+        return EOS_LOG_PATH_RE.sub(
+            "/home/user/.local/share/net.akkudoktoreos.net/output/eos.log", fragment
+        )
+
+    if ctx is None:
+        ctx = GenCtx()
+
+    yield "# Configuration Table\n\n"
 
     # Generate tables for each top level config
     for field_name, field_info in config_eos.__class__.model_fields.items():
         field_type = field_info.annotation
-        markdown += generate_config_table_md(
-            field_type, [field_name], f"EOS_{field_name.upper()}__", True
+        yield scrub(
+            generate_config_table_md(
+                field_type, [field_name], f"EOS_{field_name.upper()}__", True, ctx=ctx
+            )
         )
 
     # Full config
-    markdown += "## Full example Config\n\n"
-    markdown += "```{eval-rst}\n"
-    markdown += ".. code-block:: json\n\n"
+    parts: list[str] = ["## Full example Config\n\n"]
+    parts.append("```{eval-rst}\n")
+    parts.append(".. code-block:: json\n\n")
     # Test for valid config first
-    config_eos.merge_settings_from_dict(global_config_dict)
-    markdown += textwrap.indent(json.dumps(global_config_dict, indent=4), "   ")
-    markdown += "\n"
-    markdown += "```\n\n"
-
+    config_eos.merge_settings_from_dict(ctx.config_dict)
+    parts.append(json_code_block(ctx.config_dict))
+    parts.append("\n")
     # Assure there is no double \n at end of file
-    markdown = markdown.rstrip("\n")
-    markdown += "\n"
-
-    # Assure log path does not leak to documentation
-    markdown = re.sub(
-        r'(?<=["\'])/[^"\']*/output/eos\.log(?=["\'])',
-        '/home/user/.local/share/net.akkudoktoreos.net/output/eos.log',
-        markdown
-    )
+    parts.append("```\n")
+    yield scrub("".join(parts))
 
-    return markdown
+
+def generate_config_md(config_eos: ConfigEOS) -> str:
+    """Generate configuration specification in Markdown with extra tables for prefixed values.
+
+    Returns:
+        str: The Markdown representation of the configuration spec.
+    """
+    return "".join(generate_config_md_fragments(config_eos))
 
 
 def main():
@@ -306,17 +420,21 @@ def main():
     args = parser.parse_args()
     config_eos = get_config()
 
+    def write_config_md(write: Callable[[str], Any]) -> None:
+        for fragment in generate_config_md_fragments(config_eos):
+            if os.name == "nt":
+                fragment = fragment.replace("\\\\", "/")
+            write(fragment)
+
     try:
-        config_md = generate_config_md(config_eos)
-        if os.name == "nt":
-            config_md = config_md.replace("\\\\", "/")
         if args.output_file:
             # Write to file
             with open(args.output_file, "w", encoding="utf-8", newline="\n") as f:
-                f.write(config_md)
+                write_config_md(f.write)
         else:
             # Write to std output
-            print(config_md)
+            write_config_md(sys.stdout.write)
+            sys.stdout.write("\n")
 
     except Exception as e:
         print(f"Error during Configuration Specification generation: {e}", file=sys.stderr)
@@ -273,6 +273,9 @@ class CacheFileStore(ConfigMixin, SingletonMixin):
         >>> print(cache_file.read())  # Output: 'Some data'
     """
 
+    # Callables to be called whenever cache files are cleared.
+    _clear_hooks: ClassVar[List[Callable[[], None]]] = []
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         """Initializes the CacheFileStore instance.
 
@@ -286,6 +289,18 @@ class CacheFileStore(ConfigMixin, SingletonMixin):
         self._store_file = self.config.cache.path().joinpath("cachefilestore.json")
         super().__init__(*args, **kwargs)
 
+    @classmethod
+    def register_clear_hook(cls, hook: Callable[[], None]) -> None:
+        """Registers a callable that is called whenever cache files are cleared.
+
+        Allows in-memory copies of cached results to be dropped together with the cache files.
+
+        Args:
+            hook (Callable[[], None]): The callable to be called on `clear`.
+        """
+        if hook not in cls._clear_hooks:
+            cls._clear_hooks.append(hook)
+
     def _until_datetime_by_options(
         self,
         until_date: Optional[Any] = None,
@@ -676,6 +691,8 @@ class CacheFileStore(ConfigMixin, SingletonMixin):
                 threshold date. Cache files that are only valid before this date will be deleted.
                 The default datetime is beginning of today.
 
+        Registered clear hooks are called afterwards.
+
         Raises:
             OSError: If there's an error during file deletion.
         """
@@ -729,6 +746,9 @@ class CacheFileStore(ConfigMixin, SingletonMixin):
             for delete_key in delete_keys:
                 del self._store[delete_key]
 
+        for hook in self._clear_hooks:
+            hook()
+
     def current_store(self) -> dict:
         """Current state of the store.
 
@@ -186,7 +186,7 @@ class DataRecord(DataBase, MutableMapping):
         Raises:
             AttributeError: If the field does not exist.
         """
-        if key in self.model_fields:
+        if key in self.__class__.model_fields:
             return getattr(self, key)
         raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{key}'")
 
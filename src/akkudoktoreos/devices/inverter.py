@@ -1,5 +1,8 @@
-from typing import Optional
+import weakref
+from typing import Any, ClassVar, Optional
 
+import cachebox
+import numpy as np
 from loguru import logger
 from pydantic import Field
 
@@ -18,6 +21,12 @@ class InverterParameters(DeviceParameters):
 
 
 class Inverter(DeviceBase):
+    # Self consumption rates are a pure function of the predictor, share them between inverters
+    # (e.g. the ones set up for each optimization run).
+    _scr_lookups: ClassVar[weakref.WeakKeyDictionary[Any, cachebox.LRUCache]] = (
+        weakref.WeakKeyDictionary()
+    )
+
     def __init__(
         self,
         parameters: Optional[InverterParameters] = None,
@@ -25,21 +34,16 @@ class Inverter(DeviceBase):
         self.parameters: Optional[InverterParameters] = None
         super().__init__(parameters)
 
-        self.scr_lookup: dict = {}
-
     def _calculate_scr(self, consumption: float, generation: float) -> float:
         """Check if the consumption and production is in the lookup table. If not, calculate and store the value."""
-        if consumption not in self.scr_lookup:
-            self.scr_lookup[consumption] = {}
-
-        if generation not in self.scr_lookup[consumption]:
+        key = (consumption, generation)
+        scr = self.scr_lookup.get(key)
+        if scr is None:
             scr = self.self_consumption_predictor.calculate_self_consumption(
                 consumption, generation
             )
-            self.scr_lookup[consumption][generation] = scr
-            return scr
-
-        return self.scr_lookup[consumption][generation]
+            self.scr_lookup[key] = scr
+        return scr
 
     def _setup(self) -> None:
         if self.parameters is None:
@@ -51,6 +55,9 @@ class Inverter(DeviceBase):
             logger.error(error_msg)
             raise NotImplementedError(error_msg)
         self.self_consumption_predictor = get_eos_load_interpolator()
+        self.scr_lookup: cachebox.LRUCache = self._scr_lookups.setdefault(
+            self.self_consumption_predictor, cachebox.LRUCache(maxsize=10000)
+        )
         self.max_power_wh = (
             self.parameters.max_power_wh
         )  # Maximum power that the inverter can handle
@@ -71,33 +78,28 @@ class Inverter(DeviceBase):
         if generation >= consumption:
             if consumption > self.max_power_wh:
                 # If consumption exceeds maximum inverter power
-                losses += generation - self.max_power_wh
-                remaining_power = self.max_power_wh - consumption
-                grid_import = -remaining_power  # Negative indicates feeding into the grid
+                losses = generation - self.max_power_wh
+                grid_import = consumption - self.max_power_wh
                 self_consumption = self.max_power_wh
             else:
                 # Calculate scr with lookup table
                 scr = self._calculate_scr(consumption, generation)
 
+                surplus = generation - consumption
                 # Remaining power after consumption
-                remaining_power = (generation - consumption) * scr  # EVQ
+                remaining_power = surplus * scr  # EVQ
                 # Remaining load Self Consumption not perfect
-                remaining_load_evq = (generation - consumption) * (1.0 - scr)
+                remaining_load_evq = surplus * (1.0 - scr)
 
+                from_battery = 0.0
                 if remaining_load_evq > 0:
                     # Akku muss den Restverbrauch decken
                     from_battery, discharge_losses = self.battery.discharge_energy(
                         remaining_load_evq, hour
                     )
-                    remaining_load_evq -= from_battery  # Restverbrauch nach Akkuentladung
                     losses += discharge_losses
-
                     # Wenn der Akku den Restverbrauch nicht vollständig decken kann, wird der Rest ins Netz gezogen
-                    if remaining_load_evq > 0:
-                        grid_import += remaining_load_evq
-                        remaining_load_evq = 0
-                else:
-                    from_battery = 0.0
+                    grid_import = max(remaining_load_evq - from_battery, 0.0)
 
                 if remaining_power > 0:
                     # Load battery with excess energy
@@ -107,12 +109,8 @@ class Inverter(DeviceBase):
                     remaining_surplus = remaining_power - (charged_energie + charge_losses)
 
                     # Feed-in to the grid based on remaining capacity
-                    if remaining_surplus > self.max_power_wh - consumption:
-                        grid_export = self.max_power_wh - consumption
-                        losses += remaining_surplus - grid_export
-                    else:
-                        grid_export = remaining_surplus
-
+                    grid_export = min(remaining_surplus, self.max_power_wh - consumption)
+                    losses += remaining_surplus - grid_export
                     losses += charge_losses
                 self_consumption = (
                     consumption + from_battery
@@ -134,3 +132,43 @@ class Inverter(DeviceBase):
             self_consumption = generation + battery_discharge
 
         return grid_export, grid_import, losses, self_consumption
+
+    def process_energy_batch(
+        self, generation: np.ndarray, consumption: np.ndarray, start_hour: int = 0
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Process energy for consecutive hours.
+
+        Gives the same results as calling `process_energy` hour by hour, provided nothing else
+        changes the battery state in between. Hours where consumption exceeds the maximum
+        inverter power do not touch the battery and are computed vectorized. All other hours
+        depend on the battery state of charge and are processed sequentially.
+
+        Args:
+            generation (np.ndarray): Generated energy per hour (Wh).
+            consumption (np.ndarray): Consumed energy per hour (Wh).
+            start_hour (int): Hour of the first array element.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Grid export, grid import,
+                losses and self consumption per hour.
+        """
+        generation = np.asarray(generation, dtype=np.float64)
+        consumption = np.asarray(consumption, dtype=np.float64)
+        capped = (generation >= consumption) & (consumption > self.max_power_wh)
+
+        grid_export = np.zeros_like(generation)
+        grid_import = np.where(capped, consumption - self.max_power_wh, 0.0)
+        losses = np.where(capped, generation - self.max_power_wh, 0.0)
+        self_consumption = np.where(capped, self.max_power_wh, 0.0)
+
+        for idx in np.flatnonzero(~capped):
+            (
+                grid_export[idx],
+                grid_import[idx],
+                losses[idx],
+                self_consumption[idx],
+            ) = self.process_energy(
+                float(generation[idx]), float(consumption[idx]), start_hour + int(idx)
+            )
+
+        return grid_export, grid_import, losses, self_consumption
@@ -75,6 +75,8 @@ class EOSLoadInterpolator(SelfConsumptionProbabilityInterpolator, SingletonMixin
             return
         filename = Path(__file__).parent.resolve() / ".." / "data" / "regular_grid_interpolator.pkl"
         super().__init__(filename)
+        # SelfConsumptionProbabilityInterpolator does not chain to SingletonMixin.__init__
+        self._initialized = True
 
 
 # Initialize the Energy Management System, it is a singleton.
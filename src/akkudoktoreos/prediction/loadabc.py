@@ -5,9 +5,9 @@ Notes:
 """
 
 from abc import abstractmethod
-from typing import List, Optional
+from typing import Any, List, Optional
 
-from pydantic import Field
+from pydantic import ConfigDict, Field, model_validator
 
 from akkudoktoreos.prediction.predictionabc import PredictionProvider, PredictionRecord
 
@@ -15,6 +15,8 @@ from akkudoktoreos.prediction.predictionabc import PredictionProvider, Predictio
 class LoadDataRecord(PredictionRecord):
     """Represents a load data record containing various load attributes at a specific datetime."""
 
+    model_config = ConfigDict(extra="forbid")
+
     load_mean: Optional[float] = Field(default=None, description="Predicted load mean value (W).")
     load_std: Optional[float] = Field(
         default=None, description="Predicted load standard deviation (W)."
@@ -23,6 +25,15 @@ class LoadDataRecord(PredictionRecord):
         default=None, description="Predicted load mean value adjusted by load measurement (W)."
     )
 
+    @model_validator(mode="before")
+    @classmethod
+    def drop_computed_fields(cls, data: Any) -> Any:
+        """Drops the computed fields of serialized records, they are not extra input."""
+        if isinstance(data, dict):
+            computed_fields = cls.__pydantic_decorators__.computed_fields
+            data = {key: value for key, value in data.items() if key not in computed_fields}
+        return data
+
 
 class LoadProvider(PredictionProvider):
     """Abstract base class for load providers.
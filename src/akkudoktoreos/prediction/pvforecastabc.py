@@ -4,13 +4,18 @@ Notes:
     - Ensure appropriate API keys or configurations are set up if required by external data sources.
 """
 
+import bisect
+import functools
 from abc import abstractmethod
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Type
 
+import pendulum
 from loguru import logger
+from pendulum import DateTime
 from pydantic import Field
 
 from akkudoktoreos.prediction.predictionabc import PredictionProvider, PredictionRecord
+from akkudoktoreos.utils.datetimeutil import to_datetime
 
 
 class PVForecastDataRecord(PredictionRecord):
@@ -55,3 +60,46 @@ class PVForecastProvider(PredictionProvider):
             f"PVForecastProvider ID {self.provider_id()} vs. config {self.config.pvforecast.provider}"
         )
         return self.provider_id() == self.config.pvforecast.provider
+
+    @classmethod
+    @functools.cache
+    def _trusted_record_class(cls) -> Type:
+        """Record class for `update_value_trusted`, resolved once per provider class.
+
+        `record_class()` validates by constructing a record on every call.
+        """
+        return cls.record_class()
+
+    def update_value_trusted(self, date: DateTime, values: Dict[str, Any]) -> None:
+        """Updates values in the data record for a given date without validation.
+
+        Fast path of `update_value` for forecast data that was already validated by the
+        provider itself, e.g. a decoded and schema checked API response. Values are assigned
+        as given and new records are created by `model_construct`. Measurements and other user
+        supplied values must go through `update_value`.
+
+        The records are expected to be sorted by datetime; new records are inserted in order.
+
+        Args:
+            date (DateTime): The date for which the values are to be added or updated.
+            values (Dict[str, Any]): Dictionary of record field names and values.
+        """
+        # Ensure datetime objects are normalized, same as `update_value`.
+        date = to_datetime(date, to_maxtime=False)
+
+        index = bisect.bisect_left(
+            self.records,
+            date,
+            key=lambda record: record.date_time or pendulum.datetime(1, 1, 1, 0, 0, 0),
+        )
+        if index < len(self.records) and self.records[index].date_time == date:
+            # Update the existing record, keeping values not given (e.g. measurements)
+            record = self.records[index]
+            record.__dict__.update(values)
+            record.__pydantic_fields_set__.update(values)
+            # Drop values cached from the previous field values (e.g. by `cached_property`)
+            for key in record.__dict__.keys() - record.__class__.model_fields.keys():
+                del record.__dict__[key]
+        else:
+            record = self._trusted_record_class().model_construct(date_time=date, **values)
+            self.records.insert(index, record)
@@ -3,8 +3,7 @@
 This module provides classes and methods to retrieve, process, and display photovoltaic (PV) power forecast data. It includes features for working with environmental data such as temperature, wind speed, DC power, and AC power. Data retrieval is designed to work with Akkudoktor.net, and caching is implemented to reduce redundant network requests. Additionally, the module supports management of historical data for analysis over time.
 
 Classes:
-    AkkudoktorForecastHorizon: Represents details about the orientation of PV system horizons.
-    AkkudoktorForecastMeta: Metadata configuration for the forecast, including location, system settings, and timezone.
+    AkkudoktorForecastMeta: Metadata of the forecast, limited to the timezone of the forecast data.
     AkkudoktorForecastValue: Represents a single forecast data entry with information on temperature, wind speed, and solar orientation.
     AkkudoktorForecast: The main container for forecast data, holding both metadata and individual forecast entries.
     PVForecastAkkudoktorDataRecord: A specialized data record format for PV forecast data, including forecasted and actual AC power measurements.
@@ -75,69 +74,52 @@ Methods:
 
 """
 
-from typing import Any, List, Optional, Union
+import re
+from functools import cached_property
+from typing import Any, ClassVar, List, Optional, Union
+from urllib.parse import urlencode
 
+import cachebox
+import numpy as np
+import pandas as pd
 import requests
 from loguru import logger
-from pydantic import Field, ValidationError, computed_field, field_validator
+from pendulum import DateTime
+from pydantic import ConfigDict, Field, PrivateAttr, ValidationError, computed_field
+from requests.adapters import HTTPAdapter
+from typing_extensions import TypedDict
 
-from akkudoktoreos.core.cache import cache_in_file
+from akkudoktoreos.core.cache import CacheFileStore, cache_in_file
 from akkudoktoreos.core.pydantic import PydanticBaseModel
 from akkudoktoreos.prediction.pvforecastabc import (
     PVForecastDataRecord,
     PVForecastProvider,
 )
-from akkudoktoreos.utils.datetimeutil import compare_datetimes, to_datetime
+from akkudoktoreos.utils.datetimeutil import to_datetime, to_duration
 
+# Trailing UTC offset of an ISO 8601 datetime string
+_UTC_OFFSET_REGEX = re.compile(r"T.*(Z|[+-]\d{2}(:?\d{2})?)$")
 
-class AkkudoktorForecastHorizon(PydanticBaseModel):
-    altitude: int
-    azimuthFrom: int
-    azimuthTo: int
+# Time a fetched forecast is reused, from the cache file as well as from memory
+FORECAST_TTL = to_duration("1 hour")
 
 
 class AkkudoktorForecastMeta(PydanticBaseModel):
-    lat: float
-    lon: float
-    power: List[int]
-    azimuth: List[int]
-    tilt: List[int]
+    # Only the timezone is used, the other meta data (location, planes, horizon, ...) just
+    # echoes the request and is not validated.
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     timezone: str
-    albedo: float
-    past_days: int
-    inverterEfficiency: float
-    powerInverter: List[int]
-    cellCoEff: float
-    range: bool
-    horizont: List[List[AkkudoktorForecastHorizon]]
-    horizontString: List[str]
-
-    @field_validator("power", "azimuth", "tilt", "powerInverter", mode="before")
-    @classmethod
-    def ensure_list(cls, v: Any) -> List[int]:
-        return v if isinstance(v, list) else [v]
 
-    @field_validator("horizont", mode="before")
-    @classmethod
-    def normalize_horizont(cls, v: Any) -> List[List[AkkudoktorForecastHorizon]]:
-        if isinstance(v, list):
-            # Case: flat list of dicts
-            if v and isinstance(v[0], dict):
-                return [v]
-            # Already in correct nested form
-            if v and isinstance(v[0], list):
-                return v
-        return v
-
-    @field_validator("horizontString", mode="before")
-    @classmethod
-    def parse_horizont_string(cls, v: Any) -> List[str]:
-        if isinstance(v, str):
-            return [s.strip() for s in v.split(",")]
-        return v
 
+class AkkudoktorForecastValue(TypedDict):
+    """A single forecast value of the Akkudoktor API.
+
+    Validated by pydantic-core while decoding the JSON, but kept as a plain dict. Creating a
+    model instance for each of the thousands of forecast points is the dominant cost of a
+    request.
+    """
 
-class AkkudoktorForecastValue(PydanticBaseModel):
     datetime: str
     dcPower: float
     power: float
@@ -152,6 +134,9 @@ class AkkudoktorForecast(PydanticBaseModel):
     meta: AkkudoktorForecastMeta
     values: List[List[AkkudoktorForecastValue]]
 
+    # Set on validation of the API response and kept in the pickled cache file
+    _fetched_at: DateTime = PrivateAttr(default_factory=to_datetime)
+
 
 class PVForecastAkkudoktorDataRecord(PVForecastDataRecord):
     """Represents a Akkudoktor specific pvforecast data record containing various pvforecast attributes at a specific datetime."""
@@ -166,14 +151,21 @@ class PVForecastAkkudoktorDataRecord(PVForecastDataRecord):
         default=None, description="Temperature (°C)"
     )
 
+    def __setattr__(self, key: str, value: Any) -> None:
+        """Set attribute values, invalidating the cached AC power if one of its sources changes."""
+        if key in ("pvforecastakkudoktor_ac_power_measured", "pvforecast_ac_power"):
+            self.__dict__.pop("pvforecastakkudoktor_ac_power_any", None)
+        super().__setattr__(key, value)
+
     # Computed fields
     @computed_field  # type: ignore[prop-decorator]
-    @property
+    @cached_property
     def pvforecastakkudoktor_ac_power_any(self) -> Optional[float]:
         """Returns the AC power.
 
         If a measured value is available, it returns the measured AC power;
-        otherwise, it returns the forecasted AC power.
+        otherwise, it returns the forecasted AC power. The value is cached until the measured
+        or forecasted AC power is set.
 
         Returns:
             float: AC power in watts or None if no forecast data is available.
@@ -184,6 +176,15 @@ class PVForecastAkkudoktorDataRecord(PVForecastDataRecord):
             return self.pvforecast_ac_power
 
 
+def _akkudoktor_session() -> requests.Session:
+    """Create a HTTP session with a small connection pool for the Akkudoktor API."""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=2))
+    # requests already negotiates compression (Accept-Encoding) by default.
+    session.headers.update({"Accept": "application/json"})
+    return session
+
+
 class PVForecastAkkudoktor(PVForecastProvider):
     """Fetch and process PV forecast data from akkudoktor.net.
 
@@ -212,11 +213,23 @@ class PVForecastAkkudoktor(PVForecastProvider):
         default_factory=list, description="List of PVForecastAkkudoktorDataRecord records"
     )
 
+    # Recent Akkudoktor forecasts, keyed by request URL. Entries expire together with the
+    # cache file of `_request_forecast`.
+    _forecast_memo: ClassVar[cachebox.VTTLCache] = cachebox.VTTLCache(maxsize=4)
+
+    # HTTP session to keep the connection to the Akkudoktor API alive between requests
+    _session: ClassVar[requests.Session] = _akkudoktor_session()
+
     @classmethod
     def provider_id(cls) -> str:
         """Return the unique identifier for the Akkudoktor provider."""
         return "PVForecastAkkudoktor"
 
+    @classmethod
+    def clear_forecast_memo(cls) -> None:
+        """Clear the forecasts kept in memory, so that the next update uses the cache file."""
+        cls._forecast_memo.clear()
+
     @classmethod
     def _validate_data(cls, json_str: Union[bytes, Any]) -> AkkudoktorForecast:
         """Validate Akkudoktor PV forecast data."""
@@ -233,49 +246,70 @@ class PVForecastAkkudoktor(PVForecastProvider):
             raise ValueError(error_msg)
         return akkudoktor_data
 
+    def _plane_params(self) -> list[tuple[int, int, int, int, str]]:
+        """Akkudoktor query parameters (power, azimuth, tilt, powerInverter, horizont) per plane.
+
+        Each computed plane list of the configuration is evaluated once, not once per plane.
+        """
+        pvforecast = self.config.pvforecast
+        return [
+            (
+                int(peakpower * 1000),
+                # EOS orientation of of pv modules in azimuth in degree:
+                #   north=0, east=90, south=180, west=270
+                # Akkudoktor orientation of pv modules in azimuth in degree:
+                #   north=+-180, east=-90, south=0, west=90
+                int(azimuth) - 180,
+                int(tilt),
+                int(inverter_paco),
+                ",".join(str(int(h)) for h in userhorizon),
+            )
+            for peakpower, azimuth, tilt, inverter_paco, userhorizon in zip(
+                pvforecast.planes_peakpower,
+                pvforecast.planes_azimuth,
+                pvforecast.planes_tilt,
+                pvforecast.planes_inverter_paco,
+                pvforecast.planes_userhorizon,
+            )
+        ]
+
     def _url(self) -> str:
         """Build akkudoktor.net API request URL."""
         base_url = "https://api.akkudoktor.net/forecast"
-        query_params = [
-            f"lat={self.config.general.latitude}",
-            f"lon={self.config.general.longitude}",
+        query_params: list[tuple[str, Any]] = [
+            ("lat", self.config.general.latitude),
+            ("lon", self.config.general.longitude),
         ]
 
-        for i in range(len(self.config.pvforecast.planes)):
-            query_params.append(f"power={int(self.config.pvforecast.planes_peakpower[i] * 1000)}")
-            # EOS orientation of of pv modules in azimuth in degree:
-            #   north=0, east=90, south=180, west=270
-            # Akkudoktor orientation of pv modules in azimuth in degree:
-            #   north=+-180, east=-90, south=0, west=90
-            azimuth_akkudoktor = int(self.config.pvforecast.planes_azimuth[i]) - 180
-            query_params.append(f"azimuth={azimuth_akkudoktor}")
-            query_params.append(f"tilt={int(self.config.pvforecast.planes_tilt[i])}")
-            query_params.append(
-                f"powerInverter={int(self.config.pvforecast.planes_inverter_paco[i])}"
+        for power, azimuth, tilt, power_inverter, horizon_values in self._plane_params():
+            query_params.extend(
+                [
+                    ("power", power),
+                    ("azimuth", azimuth),
+                    ("tilt", tilt),
+                    ("powerInverter", power_inverter),
+                    ("horizont", horizon_values),
+                ]
             )
-            horizon_values = ",".join(
-                str(int(h)) for h in self.config.pvforecast.planes_userhorizon[i]
-            )
-            query_params.append(f"horizont={horizon_values}")
 
         # Append fixed query parameters
         query_params.extend(
             [
-                "past_days=5",
-                "cellCoEff=-0.36",
-                "inverterEfficiency=0.8",
-                "albedo=0.25",
-                f"timezone={self.config.general.timezone}",
-                "hourly=relativehumidity_2m%2Cwindspeed_10m",
+                ("past_days", 5),
+                ("cellCoEff", -0.36),
+                ("inverterEfficiency", 0.8),
+                ("albedo", 0.25),
+                ("timezone", self.config.general.timezone),
+                ("hourly", "relativehumidity_2m,windspeed_10m"),
             ]
         )
 
-        # Join all query parameters with `&`
-        url = f"{base_url}?{'&'.join(query_params)}"
-        logger.debug(f"Akkudoktor URL: {url}")
+        # Encode all query parameters
+        url = f"{base_url}?{urlencode(query_params)}"
+        logger.debug("Akkudoktor URL: {}", url)
         return url
 
-    @cache_in_file(with_ttl="1 hour")
+    @cache_in_file(with_ttl=FORECAST_TTL)
     def _request_forecast(self) -> AkkudoktorForecast:
         """Fetch PV forecast data from Akkudoktor API.
 
@@ -289,9 +323,12 @@ class PVForecastAkkudoktor(PVForecastProvider):
         Raises:
             ValueError: If the API response does not include expected `meta` data.
         """
-        response = requests.get(self._url(), timeout=10)
+        url = self._url()
+        response = self._session.get(url, timeout=(3.05, 30))
         response.raise_for_status()  # Raise an error for bad responses
-        logger.debug(f"Response from {self._url()}: {response}")
+        logger.debug("Response from {}: {}", url, response)
+        # Hand the raw bytes to the validator. pydantic-core parses bytes directly, decoding
+        # to `response.text` first would only add a copy.
         akkudoktor_data = self._validate_data(response.content)
         # We are working on fresh data (no cache), report update time
 
@@ -311,7 +348,15 @@ class PVForecastAkkudoktor(PVForecastProvider):
             raise ValueError(error_msg)
 
         # Get Akkudoktor PV Forecast data for the given configuration.
-        akkudoktor_data = self._request_forecast(force_update=force_update)  # type: ignore
+        # Within its lifetime the forecast is taken from memory, without reading the cache file.
+        url = self._url()
+        akkudoktor_data = None if force_update else self._forecast_memo.get(url)
+        if akkudoktor_data is None:
+            akkudoktor_data = self._request_forecast(force_update=force_update)  # type: ignore
+            # Fetched or read from the cache file, keep it for the rest of its lifetime.
+            ttl = akkudoktor_data._fetched_at + FORECAST_TTL - to_datetime()
+            if ttl.total_seconds() > 0:
+                self._forecast_memo.insert(url, akkudoktor_data, ttl.total_seconds())
 
         # Timezone of the PV system
         if self.config.general.timezone != akkudoktor_data.meta.timezone:
@@ -333,26 +378,63 @@ class PVForecastAkkudoktor(PVForecastProvider):
         if not self.start_datetime:
             raise ValueError(f"Start DateTime not set: {self.start_datetime}")
 
-        # Iterate over forecast data points
-        for forecast_values in zip(*akkudoktor_data.values):
-            original_datetime = forecast_values[0].datetime
-            dt = to_datetime(original_datetime, in_timezone=self.config.general.timezone)
+        # Forecast data points available for all planes
+        n_hours = min(len(plane) for plane in akkudoktor_data.values)
+
+        # Convert all forecast datetimes at once to UTC timestamps (seconds since epoch)
+        forecast_datetimes = [akkudoktor_data.values[0][i]["datetime"] for i in range(n_hours)]
+        with_utc_offset = [bool(_UTC_OFFSET_REGEX.search(value)) for value in forecast_datetimes]
+        if all(with_utc_offset):
+            datetimes = pd.to_datetime(forecast_datetimes, utc=True)
+        elif not any(with_utc_offset):
+            # Datetimes without UTC offset are local time of the PV system
+            datetimes = pd.to_datetime(forecast_datetimes).tz_localize(
+                self.config.general.timezone, ambiguous="infer", nonexistent="shift_forward"
+            )
+        else:
+            error_msg = "Forecast datetimes are given partly with and partly without UTC offset."
+            logger.error(f"Akkudoktor schema change: {error_msg}")
+            raise ValueError(error_msg)
+        epoch_seconds = (datetimes - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+        timestamps = epoch_seconds.to_numpy(dtype=np.int64)
+
+        # Skip outdated forecast data. Data points are in ascending order, so search the start
+        # on the epochs - the datetime strings change their UTC offset and do not sort lexically.
+        cutoff_timestamp = self.start_datetime.start_of("day").int_timestamp
+        start = int(np.searchsorted(timestamps, cutoff_timestamp, side="left"))
+        plane_values = [plane[start:n_hours] for plane in akkudoktor_data.values]
+        forecast_values = plane_values[0]
+
+        # Sum up the power of all planes per forecast data point
+        dc_power = np.array(
+            [[values["dcPower"] for values in plane] for plane in plane_values],
+            dtype=np.float64,
+        )
+        ac_power = np.array(
+            [[values["power"] for values in plane] for plane in plane_values],
+            dtype=np.float64,
+        )
+        sum_dc_power = dc_power.sum(axis=0).tolist()
+        sum_ac_power = ac_power.sum(axis=0).tolist()
+
+        timezone = self.config.general.timezone
 
-            # Skip outdated forecast data
-            if compare_datetimes(dt, self.start_datetime.start_of("day")).lt:
-                continue
+        # Records have to be in order for the trusted update
+        self.sort_by_datetime()
 
-            sum_dc_power = sum(values.dcPower for values in forecast_values)
-            sum_ac_power = sum(values.power for values in forecast_values)
+        # Iterate over forecast data points by index, datetimes only for the data points kept
+        for i, timestamp in enumerate(timestamps[start:].tolist()):
+            dt = to_datetime(timestamp, in_timezone=timezone)
 
             data = {
-                "pvforecast_dc_power": sum_dc_power,
-                "pvforecast_ac_power": sum_ac_power,
-                "pvforecastakkudoktor_wind_speed_10m": forecast_values[0].windspeed_10m,
-                "pvforecastakkudoktor_temp_air": forecast_values[0].temperature,
+                "pvforecast_dc_power": sum_dc_power[i],
+                "pvforecast_ac_power": sum_ac_power[i],
+                "pvforecastakkudoktor_wind_speed_10m": forecast_values[i]["windspeed_10m"],
+                "pvforecastakkudoktor_temp_air": forecast_values[i]["temperature"],
             }
 
-            self.update_value(dt, data)
+            # Data is validated by `_validate_data` - skip record validation
+            self.update_value_trusted(dt, data)
 
         if len(self) < self.config.prediction.hours:
             raise ValueError(
@@ -379,20 +461,18 @@ class PVForecastAkkudoktor(PVForecastProvider):
             """Helper to format values as rounded strings or 'N/A' if None."""
             return f"{round(value, 2)}" if value is not None else "N/A"
 
-        report_lines = []
-        for record in self.records:
-            date_time = record.date_time
-            dc_power = format_value(record.pvforecast_dc_power)
-            ac_power = format_value(record.pvforecast_ac_power)
-            ac_power_measured = format_value(record.pvforecastakkudoktor_ac_power_measured)
-            ac_power_any = format_value(record.pvforecastakkudoktor_ac_power_any)
-
-            report_lines.append(
-                f"Date&Time: {date_time}, DC: {dc_power}, AC: {ac_power}, "
-                f"AC sampled: {ac_power_measured}, AC any: {ac_power_any}"
-            )
+        return "\n".join(
+            f"Date&Time: {record.date_time}, "
+            f"DC: {format_value(record.pvforecast_dc_power)}, "
+            f"AC: {format_value(record.pvforecast_ac_power)}, "
+            f"AC sampled: {format_value(record.pvforecastakkudoktor_ac_power_measured)}, "
+            f"AC any: {format_value(record.pvforecastakkudoktor_ac_power_any)}"
+            for record in self.records
+        )
+
 
-        return "\n".join(report_lines)
+# Drop the forecasts kept in memory together with the cache files
+CacheFileStore.register_clear_hook(PVForecastAkkudoktor.clear_forecast_memo)
 
 
 # Example of how to use the PVForecastAkkudoktor class
@@ -422,6 +422,19 @@ class TestCacheFileStore:
         assert cache_file_store.get("file1") is None
         assert cache_file_store.get("file2") is None
 
+    def test_clear_calls_clear_hooks(self, cache_file_store):
+        """Test that registered clear hooks are called on clearing cache files."""
+        hook = MagicMock()
+        CacheFileStore.register_clear_hook(hook)
+        CacheFileStore.register_clear_hook(hook)
+        try:
+            cache_file_store.clear(before_datetime=to_datetime())
+            assert hook.call_count == 1
+            cache_file_store.clear(clear_all=True)
+            assert hook.call_count == 2
+        finally:
+            CacheFileStore._clear_hooks.remove(hook)
+
     def test_cache_file_with_date(self, cache_file_store):
         """Test creating and retrieving cache files with a specific date."""
         # Use a specific date for cache file creation
@@ -1,5 +1,6 @@
 from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest
 
 from akkudoktoreos.devices.inverter import Inverter, InverterParameters
@@ -340,3 +341,56 @@ def test_process_energy_zero_generation_full_battery_high_consumption(inverter,
     mock_battery.charge_energy.assert_not_called()
     mock_battery.discharge_energy.assert_called_once_with(500.0, hour)
     inverter.self_consumption_predictor.calculate_self_consumption.assert_not_called()
+
+
+def test_process_energy_batch(inverter, mock_battery):
+    mock_battery.charge_energy.return_value = (100.0, 10.0)
+    mock_battery.discharge_energy.return_value = (50.0, 5.0)
+    generation = np.array([600.0, 100.0, 1000.0, 300.0])
+    consumption = np.array([200.0, 250.0, 600.0, 300.0])  # hour 2 exceeds max power
+    start_hour = 10
+
+    expected = [
+        inverter.process_energy(generation[i], consumption[i], start_hour + i)
+        for i in range(len(generation))
+    ]
+    mock_battery.reset_mock()
+
+    grid_export, grid_import, losses, self_consumption = inverter.process_energy_batch(
+        generation, consumption, start_hour
+    )
+
+    for i, (exp_export, exp_import, exp_losses, exp_self_consumption) in enumerate(expected):
+        assert grid_export[i] == pytest.approx(exp_export)
+        assert grid_import[i] == pytest.approx(exp_import)
+        assert losses[i] == pytest.approx(exp_losses)
+        assert self_consumption[i] == pytest.approx(exp_self_consumption)
+    # Capped hour is computed without the battery
+    assert grid_import[2] == pytest.approx(100.0)
+    assert losses[2] == pytest.approx(500.0)
+    assert self_consumption[2] == pytest.approx(500.0)
+    called_hours = [c.args[1] for c in mock_battery.charge_energy.call_args_list] + [
+        c.args[1] for c in mock_battery.discharge_energy.call_args_list
+    ]
+    assert start_hour + 2 not in called_hours
+
+
+def test_scr_lookup_shared_between_inverters(inverter, mock_battery, devices_eos):
+    predictor = inverter.self_consumption_predictor
+    inverter.process_energy(600.0, 200.0, 12)
+    with patch(
+        "akkudoktoreos.devices.inverter.get_eos_load_interpolator",
+        return_value=predictor,
+    ):
+        other = Inverter(
+            InverterParameters(
+                device_id="iv2", max_power_wh=500.0, battery_id=mock_battery.device_id
+            ),
+        )
+    devices_eos.add_device(other)
+    devices_eos.post_setup()
+
+    other.process_energy(600.0, 200.0, 13)
+
+    assert other.scr_lookup is inverter.scr_lookup
+    predictor.calculate_self_consumption.assert_called_once_with(200.0, 600.0)
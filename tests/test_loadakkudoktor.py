@@ -3,9 +3,11 @@ from unittest.mock import patch
 import numpy as np
 import pendulum
 import pytest
+from pydantic import ValidationError
 
 from akkudoktoreos.core.ems import get_ems
 from akkudoktoreos.measurement.measurement import MeasurementDataRecord, get_measurement
+from akkudoktoreos.prediction.loadabc import LoadDataRecord
 from akkudoktoreos.prediction.loadakkudoktor import (
     LoadAkkudoktor,
     LoadAkkudoktorCommonSettings,
@@ -78,6 +80,28 @@ def test_loadakkudoktor_settings_validator():
     assert settings.loadakkudoktor_year_energy == 1234.56
 
 
+def test_load_data_record_forbids_extra_fields():
+    """Test that unknown keys are rejected by `LoadDataRecord`."""
+    record = LoadDataRecord(load_mean=500.0)
+    assert record.load_mean == 500.0
+
+    with pytest.raises(ValidationError):
+        LoadDataRecord(foo=1)  # type: ignore[call-arg]
+
+
+def test_load_data_record_round_trip():
+    """Test that serialized records, including computed fields, validate again."""
+    record = LoadDataRecord(date_time="2024-11-09T12:00:00+01:00", load_mean=500.0)
+    assert "start_datetime" in record.to_dict()
+
+    for restored in (
+        LoadDataRecord.from_dict(record.to_dict()),
+        LoadDataRecord.from_json(record.to_json()),
+    ):
+        assert restored.date_time == record.date_time
+        assert restored.load_mean == 500.0
+
+
 def test_loadakkudoktor_provider_id(provider):
     """Test the `provider_id` class method."""
     assert provider.provider_id() == "LoadAkkudoktor"
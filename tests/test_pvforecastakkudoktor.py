@@ -1,14 +1,17 @@
+import json
 import sys
 from pathlib import Path
 from unittest.mock import Mock, patch
 
 import pytest
 from loguru import logger
+from pydantic import ValidationError
 
+from akkudoktoreos.core.cache import CacheFileStore
 from akkudoktoreos.core.ems import get_ems
 from akkudoktoreos.prediction.prediction import get_prediction
 from akkudoktoreos.prediction.pvforecastakkudoktor import (
-    AkkudoktorForecastHorizon,
+    FORECAST_TTL,
     AkkudoktorForecastMeta,
     AkkudoktorForecastValue,
     PVForecastAkkudoktor,
@@ -115,7 +118,7 @@ def sample_forecast_report():
 @pytest.fixture
 def sample_forecast_start(sample_forecast_data):
     """Fixture that returns the start date of the sample forecast data."""
-    forecast_start = to_datetime(sample_forecast_data.values[0][0].datetime)
+    forecast_start = to_datetime(sample_forecast_data.values[0][0]["datetime"])
     expected_datetime = to_datetime("2024-10-06T00:00:00.000+02:00")
     assert compare_datetimes(to_datetime(forecast_start), expected_datetime).equal
 
@@ -133,6 +136,14 @@ def provider():
     return provider
 
 
+@pytest.fixture(autouse=True)
+def clear_forecast_memo():
+    """Fixture that keeps forecasts in memory from leaking between tests."""
+    PVForecastAkkudoktor.clear_forecast_memo()
+    yield
+    PVForecastAkkudoktor.clear_forecast_memo()
+
+
 @pytest.fixture
 def provider_empty_instance():
     """Fixture that returns an empty instance of PVForecast."""
@@ -143,22 +154,23 @@ def provider_empty_instance():
 
 
 # Sample data for testing
-sample_horizon = AkkudoktorForecastHorizon(altitude=30, azimuthFrom=90, azimuthTo=180)
-sample_meta = AkkudoktorForecastMeta(
-    lat=52.52,
-    lon=13.405,
-    power=[5000],
-    azimuth=[180],
-    tilt=[30],
-    timezone="Europe/Berlin",
-    albedo=0.25,
-    past_days=5,
-    inverterEfficiency=0.8,
-    powerInverter=[10000],
-    cellCoEff=-0.36,
-    range=True,
-    horizont=[[sample_horizon]],
-    horizontString=["sample_horizon"],
+sample_meta = AkkudoktorForecastMeta.model_validate(
+    {
+        "lat": 52.52,
+        "lon": 13.405,
+        "power": [5000],
+        "azimuth": [180],
+        "tilt": [30],
+        "timezone": "Europe/Berlin",
+        "albedo": 0.25,
+        "past_days": 5,
+        "inverterEfficiency": 0.8,
+        "powerInverter": [10000],
+        "cellCoEff": -0.36,
+        "range": True,
+        "horizont": [[{"altitude": 30, "azimuthFrom": 90, "azimuthTo": 180}]],
+        "horizontString": ["sample_horizon"],
+    }
 )
 sample_value = AkkudoktorForecastValue(
     datetime="2024-11-09T12:00:00",
@@ -193,31 +205,23 @@ sample_config_data = {
 }
 
 
-# Tests for AkkudoktorForecastHorizon
-def test_akkudoktor_forecast_horizon():
-    horizon = AkkudoktorForecastHorizon(altitude=30, azimuthFrom=90, azimuthTo=180)
-    assert horizon.altitude == 30
-    assert horizon.azimuthFrom == 90
-    assert horizon.azimuthTo == 180
-
-
 # Tests for AkkudoktorForecastMeta
 def test_akkudoktor_forecast_meta():
     meta = sample_meta
-    assert meta.lat == 52.52
-    assert meta.lon == 13.405
-    assert meta.power == [5000]
-    assert meta.tilt == [30]
     assert meta.timezone == "Europe/Berlin"
+    # Unused meta data is ignored
+    assert "lat" not in meta.model_dump()
+    with pytest.raises(ValidationError):
+        meta.timezone = "UTC"
 
 
 # Tests for AkkudoktorForecastValue
 def test_akkudoktor_forecast_value():
     value = sample_value
-    assert value.dcPower == 500.0
-    assert value.power == 480.0
-    assert value.temperature == 15.0
-    assert value.windspeed_10m == 10.0
+    assert value["dcPower"] == 500.0
+    assert value["power"] == 480.0
+    assert value["temperature"] == 15.0
+    assert value["windspeed_10m"] == 10.0
 
 
 # Tests for PVForecastAkkudoktorDataRecord
@@ -235,6 +239,17 @@ def test_pvforecast_akkudoktor_data_record():
     )  # Assuming AC power measured is preferred
 
 
+def test_pvforecast_akkudoktor_data_record_ac_power_any_cache():
+    record = PVForecastAkkudoktorDataRecord(pvforecast_ac_power=400.0)
+    assert record.pvforecastakkudoktor_ac_power_any == 400.0
+    record.pvforecastakkudoktor_ac_power_measured = 900.0
+    assert record.pvforecastakkudoktor_ac_power_any == 900.0
+    record["pvforecastakkudoktor_ac_power_measured"] = None
+    assert record.pvforecastakkudoktor_ac_power_any == 400.0
+    record.pvforecast_ac_power = 500.0
+    assert record.pvforecastakkudoktor_ac_power_any == 500.0
+
+
 def test_pvforecast_akkudoktor_validate_data(provider_empty_instance, sample_forecast_data_raw):
     """Test validation of PV forecast data on sample data."""
     logger.info("The following errors are intentional and part of the test.")
@@ -261,7 +276,7 @@ def test_pvforecast_akkudoktor_validate_data_single_plane(
     # everything worked
 
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_pvforecast_akkudoktor_update_with_sample_forecast(
     mock_get, sample_settings, sample_forecast_data_raw, sample_forecast_start, provider
 ):
@@ -280,6 +295,175 @@ def test_pvforecast_akkudoktor_update_with_sample_forecast(
     assert compare_datetimes(provider[0].date_time, to_datetime(sample_forecast_start)).equal
 
 
+@patch("requests.Session.get")
+def test_pvforecast_akkudoktor_update_naive_datetimes(
+    mock_get, sample_settings, sample_forecast_data_raw, sample_forecast_start, provider
+):
+    """Test that forecast datetimes without UTC offset are read as local time."""
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.content = sample_forecast_data_raw
+    mock_get.return_value = mock_response
+
+    ems_eos = get_ems()
+    ems_eos.set_start_datetime(sample_forecast_start)
+    provider.clear()
+    provider.update_data(force_enable=True, force_update=True)
+    expected_datetimes = [record.date_time for record in provider]
+
+    # Same forecast, datetimes without the "+02:00" offset
+    forecast = json.loads(sample_forecast_data_raw)
+    for plane in forecast["values"]:
+        for value in plane:
+            value["datetime"] = value["datetime"][:-6]
+    mock_response.content = json.dumps(forecast).encode()
+
+    provider.clear()
+    provider.update_data(force_enable=True, force_update=True)
+    assert len(provider) > 0
+    assert [record.date_time for record in provider] == expected_datetimes
+
+    # Mixed datetimes with and without offset are rejected
+    forecast["values"][0][0]["datetime"] += "+02:00"
+    mock_response.content = json.dumps(forecast).encode()
+    with pytest.raises(ValueError, match="UTC offset"):
+        provider.update_data(force_enable=True, force_update=True)
+
+
+@patch("requests.Session.get")
+def test_pvforecast_akkudoktor_update_skips_outdated(
+    mock_get, sample_settings, sample_forecast_data_raw, sample_forecast_start, provider
+):
+    """Test that forecast data before the start day is skipped."""
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.content = sample_forecast_data_raw
+    mock_get.return_value = mock_response
+
+    provider.clear()
+    start_datetime = sample_forecast_start + to_duration("2 days 5 hours")
+    ems_eos = get_ems()
+    ems_eos.set_start_datetime(start_datetime)
+    provider.update_data(force_enable=True, force_update=True)
+    expected_start = provider.start_datetime.start_of("day")
+    assert compare_datetimes(provider[0].date_time, expected_start).equal
+    skipped_hours = (expected_start - sample_forecast_start).in_hours()
+    assert skipped_hours > 0
+    assert len(provider) == 288 - skipped_hours
+
+
+@patch("requests.Session.get")
+def test_request_forecast_memo(
+    mock_get,
+    sample_settings,
+    sample_forecast_data,
+    sample_forecast_data_raw,
+    sample_forecast_start,
+    provider,
+):
+    """Test that a fetched forecast is reused from memory until the memo is cleared."""
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.content = sample_forecast_data_raw
+    mock_get.return_value = mock_response
+
+    ems_eos = get_ems()
+    ems_eos.set_start_datetime(sample_forecast_start)
+    provider.update_data(force_enable=True, force_update=True)
+    assert mock_get.call_count == 1
+
+    # Served from memory
+    with patch.object(PVForecastAkkudoktor, "_request_forecast", side_effect=AssertionError):
+        provider.update_data(force_enable=True)
+
+    # Cleared together with the cache files
+    CacheFileStore().clear(before_datetime=to_datetime())
+    with patch.object(
+        PVForecastAkkudoktor, "_request_forecast", return_value=sample_forecast_data
+    ) as mock_request:
+        provider.update_data(force_enable=True)
+        assert mock_request.call_count == 1
+
+
+def test_request_forecast_memo_lifetime(
+    sample_settings, sample_forecast_data, sample_forecast_start, provider
+):
+    """Test that a forecast from the cache file is kept in memory for the rest of its lifetime."""
+    ems_eos = get_ems()
+    ems_eos.set_start_datetime(sample_forecast_start)
+
+    # Read from the cache file within its lifetime
+    with patch.object(
+        PVForecastAkkudoktor, "_request_forecast", return_value=sample_forecast_data
+    ) as mock_request:
+        provider.update_data(force_enable=True)
+        provider.update_data(force_enable=True)
+        assert mock_request.call_count == 1
+
+    # Read from the cache file at the end of its lifetime
+    PVForecastAkkudoktor.clear_forecast_memo()
+    sample_forecast_data._fetched_at = to_datetime() - FORECAST_TTL
+    with patch.object(
+        PVForecastAkkudoktor, "_request_forecast", return_value=sample_forecast_data
+    ) as mock_request:
+        provider.update_data(force_enable=True)
+        provider.update_data(force_enable=True)
+        assert mock_request.call_count == 2
+
+
+def test_update_value_trusted(provider):
+    """Test the trusted update path used for decoded forecast data."""
+    provider.clear()
+    start = to_datetime("2024-10-06T00:00:00+02:00")
+    provider.update_value(start, "pvforecastakkudoktor_ac_power_measured", 1000.0)
+
+    # Insert in reverse order, the records have to be kept in chronological order.
+    # The record class is resolved once, not by a validating `record_class()` per record.
+    provider._trusted_record_class()
+    with patch.object(PVForecastAkkudoktor, "record_class", side_effect=AssertionError):
+        for hour in (2, 1, 0):
+            provider.update_value_trusted(
+                start + to_duration(f"{hour} hours"), {"pvforecast_ac_power": 100.0 * hour}
+            )
+
+    assert len(provider) == 3
+    assert [record.pvforecast_ac_power for record in provider.records] == [0.0, 100.0, 200.0]
+    assert compare_datetimes(provider[2].date_time, start + to_duration("2 hours")).equal
+    # Measurement of the existing record is kept
+    assert provider[0].pvforecastakkudoktor_ac_power_measured == 1000.0
+    assert provider[0].pvforecastakkudoktor_ac_power_any == 1000.0
+    assert provider[1].pvforecastakkudoktor_ac_power_any == 100.0
+
+    # Cached AC power follows trusted updates of existing records
+    provider.update_value_trusted(start + to_duration("1 hours"), {"pvforecast_ac_power": 150.0})
+    assert provider[1].pvforecastakkudoktor_ac_power_any == 150.0
+
+
+def test_url_follows_plane_config(sample_settings, provider, config_eos):
+    """Test that the plane query parameters follow configuration changes."""
+    url = provider._url()
+    assert "power=5000&azimuth=-10&tilt=7&powerInverter=10000" in url
+
+    config_eos.merge_settings_from_dict(
+        {
+            "pvforecast": {
+                "planes": [
+                    {
+                        "peakpower": 6.0,
+                        "surface_azimuth": 180,
+                        "surface_tilt": 30,
+                        "inverter_paco": 8000,
+                        "userhorizon": [10, 20],
+                    }
+                ]
+            }
+        }
+    )
+    url = provider._url()
+    assert "power=6000&azimuth=0&tilt=30&powerInverter=8000&horizont=10%2C20" in url
+    assert "power=5000" not in url
+
+
 # Report Generation Test
 def test_report_ac_power_and_measurement(provider, config_eos):
     # Set the configuration
@@ -301,7 +485,7 @@ def test_report_ac_power_and_measurement(provider, config_eos):
 @pytest.mark.skipif(
     sys.platform.startswith("win"), reason="'other_timezone' fixture not supported on Windows"
 )
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_timezone_behaviour(
     mock_get,
     sample_settings,